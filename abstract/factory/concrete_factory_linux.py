@@ -6,7 +6,13 @@ from typing import Dict
 
 class LinuxAppComponents(AppComponents):
     def create_config(self) -> Config:
-        return LinuxConfig()
+        loader = LinuxConfig()
+        return Config(
+            home_img_path    = loader.home_img(),
+            serial_port_name = loader.serial_port_name(),
+            baudrate         = loader.baudrate(),
+            uid_map          = loader.load_config(),
+        )
 
     def create_serial(self, port_name: str = "/dev/rfid0", baudrate: int = 115200) -> SerialPort:
         return LinuxSerialPort(port_name = port_name, baudrate = baudrate)
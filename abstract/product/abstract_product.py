@@ -1,23 +1,16 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple, Dict, Callable
-import tkinter
-from PIL import Image, ImageTk
+from typing import Optional, Tuple, Dict, Callable
 
 # --- Abstract Products ---
 
-class Config(ABC):
-    @abstractmethod
-    def home_img(self) -> Path: ...
-
-    @abstractmethod
-    def load_config(self) -> Dict[str, str]: ...
-
-    @abstractmethod
-    def serial_port_name(self) -> str: ...
-
-    @abstractmethod
-    def baudrate(self) -> int: ...
+@dataclass(frozen=True, slots=True)
+class Config:
+    home_img_path: Path
+    serial_port_name: str
+    baudrate: int
+    uid_map: Dict[str, str]     # {uid: filepath}
 
 
 class SerialPort(ABC):
@@ -28,13 +21,16 @@ class SerialPort(ABC):
     def close(self) -> None: ...
 
     @abstractmethod
-    def receive_datas(self) -> List[str]: ...
+    def receive_last_data(self) -> Optional[str]: ...
 
     @abstractmethod
     def is_opened(self) -> bool: ...
 
     @abstractmethod
-    def get_time_polling(self) -> int: ...
+    def get_time_polling(self) -> float: ...
+
+    @abstractmethod
+    def fileno(self) -> Optional[int]: ...
 
 
 class MediaEngine(ABC):
@@ -54,6 +50,15 @@ class MediaEngine(ABC):
     def cancel_run_loop_after_time(self, job: str) -> None: ...
 
 
+class FileWatcher(ABC):
+    """Tùy chọn: media engine gọi lại khi một fd có dữ liệu (chỉ có trên Linux)"""
+    @abstractmethod
+    def create_file_handler(self, fd: int, func: Callable) -> None: ...
+
+    @abstractmethod
+    def delete_file_handler(self, fd: int) -> None: ...
+
+
 
 
 
@@ -1,30 +1,34 @@
-from .abstract_product import Config, SerialPort, MediaEngine
+from .abstract_product import SerialPort, MediaEngine, FileWatcher
 from typing import List, Optional, Tuple, Dict, Callable
+from collections import OrderedDict
+from itertools import islice
 from pathlib import Path
-from PIL import Image, ImageTk
 from utils.logger import Logger
 import serial
 import tkinter
 import vlc
-import yaml
+import pickle
+import random
+import select
+import threading
+import time
 import sys
-import gc
+import os
 
-class Singleton:
-    _instance = None
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+PARSE_TIMEOUT_MS = 1000
+MAX_MEDIA_CACHE  = 8     # số vlc.Media giữ trong RAM
+MAX_PLAYER_RESTARTS = 3   # số lần khởi tạo lại player tối đa cho một UID ...
+RESTART_WINDOW_S    = 30  # ... trong khoảng thời gian này, quá thì về màn hình home
 
 
 # --- Concrete Products for Linux ---
 
-class LinuxConfig(Config):
+class LinuxConfig:
     def __init__(self):
         self.__video_dir    = Path(r"/home/pi/Videos")
         self.__home_img     = Path(r"/home/pi/RFID/JPG/Home.jpg")
         self.__cfg          = Path(r"/home/pi/RFID/config.yaml")
+        self.__cfg_cache    = self.__cfg.with_suffix(".yaml.pkl")
         self.__serial       = "/dev/rfid0"
         self.__baudrate     = 115200
 
@@ -36,36 +40,102 @@ class LinuxConfig(Config):
 
     def load_config(self) -> Dict[str, str]:
         try:
+            # Khóa cache: thay đổi config.yaml hoặc thêm/xóa video đều làm cache mất hiệu lực
+            try:
+                key = (self.__cfg.stat().st_mtime_ns, self.__video_dir.stat().st_mtime_ns)
+            except OSError as e:
+                # Thư mục video chưa mount / thiếu file: bỏ qua cache, đọc YAML như bình thường
+                Logger().warning(f"Config cache disabled: {e}")
+                key = None
+            if key is not None:
+                uid_map = self.__load_cache(key)
+                if uid_map is not None:
+                    return uid_map
+
+            # Chỉ nạp PyYAML khi cache không dùng được
+            import yaml
+            loader = getattr(yaml, "CSafeLoader", None)
+            if loader is None:
+                Logger().warning("libyaml not available, using pure-Python YAML loader (install libyaml-dev and reinstall PyYAML)")
+                loader = yaml.SafeLoader
             with self.__cfg.open(encoding="utf-8") as f:
-                cfg = yaml.safe_load(f)
+                cfg = yaml.load(f, Loader=loader)
+            # Một lần đọc thư mục thay cho một lần stat mỗi UID
+            existing = self.__list_files(self.__video_dir)
+            if existing is None:
+                key = None  # không lưu cache cho lần đọc lỗi, sửa quyền thư mục không đổi mtime
+                existing = set()
             uid_map = {}
             for uid, fname in cfg.get("uid_map", {}).items():
-                path = (self.__video_dir / fname).resolve()
-                if not path.exists():
+                path = self.__video_dir / fname
+                if os.path.basename(fname) != fname:
+                    # Đường dẫn con hoặc tuyệt đối: không có trong lần scandir, kiểm tra riêng.
+                    # File ngoài thư mục video không làm đổi mtime của nó nên không lưu cache
+                    key = None
+                    found = os.path.isfile(path)
+                else:
+                    found = fname in existing
+                if not found:
                     Logger().error(f"Video file not found: {path}")
                     continue
                 uid_map[uid] = str(path)
             if not uid_map:
                 Logger().error("No valid videos found in configuration")
+            if key is not None:
+                self.__save_cache(key, uid_map)
             return uid_map
         except Exception as e:
             Logger().error(f"Configuration error: {e}")
             raise
 
-    
-        
+    @staticmethod
+    def __list_files(folder: Path) -> Optional[set]:
+        """Names of the regular files in folder (None if it cannot be read)"""
+        try:
+            return {e.name for e in os.scandir(folder) if e.is_file()}
+        except OSError as e:
+            Logger().error(f"Cannot read video directory {folder}: {e}")
+            return None
+
+    def __load_cache(self, key: Tuple[int, int]) -> Optional[Dict[str, str]]:
+        """Load uid_map from the pickle sidecar if it matches the current key"""
+        try:
+            with self.__cfg_cache.open("rb") as f:
+                cached_key, uid_map = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            Logger().warning(f"Ignoring unreadable config cache: {e}")
+            return None
+        if cached_key != key:
+            return None
+        Logger().debug(f"Loaded configuration from cache: {self.__cfg_cache}")
+        return uid_map
+
+    def __save_cache(self, key: Tuple[int, int], uid_map: Dict[str, str]) -> None:
+        """Write uid_map to the pickle sidecar atomically"""
+        tmp = self.__cfg_cache.with_name(self.__cfg_cache.name + ".tmp")
+        try:
+            with tmp.open("wb") as f:
+                pickle.dump((key, uid_map), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.__cfg_cache)
+        except OSError as e:
+            Logger().warning(f"Cannot write config cache: {e}")
+
 
 # ──────────────────────────────────────────────────────────────
 # Concrete Products - Serial
 # ──────────────────────────────────────────────────────────────
-class LinuxSerialPort(Singleton ,SerialPort):
+class LinuxSerialPort(SerialPort):
     def __init__(self, port_name: str = "/dev/rfid0", baudrate: int = 115200):
         self.__port = port_name
         self.__baud = baudrate
         self.__ser: Optional[serial.Serial] = None
+        self.__fd: Optional[int] = None
+        self.__rx_buf = bytearray()  # Dữ liệu chưa xử lý từ các lần đọc trước
 
-        self.__max_backoff = 16  # Giới hạn thời gian backoff tối đa là 30 giây
-        self.__min_backoff = 1  # Thời gian chờ tối thiểu là 2 giây
+        self.__max_backoff = 16     # Giới hạn thời gian backoff tối đa là 16 giây
+        self.__min_backoff = 0.05   # Thử lại lần đầu gần như ngay lập tức
         self.__backoff_time = self.__min_backoff
         self.__error_count = 0
 
@@ -75,6 +145,7 @@ class LinuxSerialPort(Singleton ,SerialPort):
     def open(self) -> None:
         if self.__ser:
             self.__ser = None
+        self.__rx_buf = bytearray()
         try:
             self.__ser = serial.Serial(
                 self.__port,
@@ -82,29 +153,63 @@ class LinuxSerialPort(Singleton ,SerialPort):
                 timeout=0.1,
                 write_timeout=0.1
             )
+            # Đọc thẳng fd (non-blocking), bỏ qua lớp read() của pyserial
+            self.__fd = self.__ser.fileno()
+            os.set_blocking(self.__fd, False)
             self.__backoff_time = self.__min_backoff
             Logger().info(f"Serial connected: {self.__port}")
+            try:
+                # Bật ASYNC_LOW_LATENCY để driver USB-serial đẩy dữ liệu lên ngay
+                self.__ser.set_low_latency_mode(True)
+            except (ValueError, OSError) as e:
+                Logger().warning(f"Serial low latency mode not supported: {e}")
         except (serial.SerialException, OSError) as e:
             self.__ser = None
-            Logger().error(f"Serial connection failed: {str(e)}, reconnect after {self.__backoff_time}s")
+            self.__fd = None
+            Logger().error(f"Serial connection failed: {str(e)}")
             
 
     def close(self) -> None:
         if self.is_opened():
             self.__ser.close()
             self.__ser = None
+            self.__fd = None
     
-    def receive_datas(self) -> list[str]:
-        lines = []
+    def receive_last_data(self) -> Optional[str]:
         try:
-            while self.__ser.in_waiting > 0:
-                s = self.__ser.readline().decode("utf-8", "ignore").strip()
-                if s:
-                    lines.append(s)
-        except (serial.SerialException, OSError) as e:
+            chunk = os.read(self.__fd, 4096)
+        except BlockingIOError:
+            return None
+        except OSError as e:
             self.close()
             Logger().error(f"Serial error: {e}")
-        return lines
+            return None
+        if not chunk:
+            # pyserial để tty ở VMIN=0/VTIME=0 nên read rỗng chỉ có nghĩa là chưa có dữ liệu;
+            # thiết bị bị rút thì tty bị hang up, poll() báo POLLHUP/POLLERR
+            if self.__is_hung_up():
+                self.close()
+                Logger().error("Serial error: device disconnected")
+            return None
+        self.__rx_buf += chunk
+        return self.__pop_last_line()
+
+    def __is_hung_up(self) -> bool:
+        """True nếu tty đã bị hang up (thiết bị USB-serial bị rút)"""
+        poller = select.poll()
+        poller.register(self.__fd, select.POLLIN)
+        return any(mask & (select.POLLHUP | select.POLLERR | select.POLLNVAL)
+                   for _, mask in poller.poll(0))
+
+    def __pop_last_line(self) -> Optional[str]:
+        """Tách các dòng trong buffer, chỉ decode dòng hoàn chỉnh cuối cùng"""
+        *lines, rest = self.__rx_buf.split(b"\n")
+        self.__rx_buf = rest  # dòng chưa trọn, giữ cho lần đọc sau
+        for line in reversed(lines):
+            line = line.strip()
+            if line:
+                return line.decode("ascii", "ignore")
+        return None
     
     def send_cmd(self, cmd: str) -> None:
         if self.is_opened():
@@ -116,19 +221,22 @@ class LinuxSerialPort(Singleton ,SerialPort):
     
     def is_opened(self) -> bool:
         return bool(self.__ser and self.__ser.is_open)
+
+    def fileno(self) -> Optional[int]:
+        return self.__fd if self.is_opened() else None
             
-    def get_time_polling(self):
+    def get_time_polling(self) -> float:
         self.__error_count += 1
-        # Tăng thời gian backoff theo cấp số nhân nhưng không vượt quá giới hạn
-        self.__backoff_time = min(self.__backoff_time * 2, self.__max_backoff)
-        return self.__backoff_time
+        # Tăng backoff theo cấp số nhân 1.3 (không vượt quá giới hạn), full jitter
+        self.__backoff_time = min(self.__backoff_time * 1.3, self.__max_backoff)
+        return random.uniform(self.__min_backoff, self.__backoff_time)
 
 
 
 # ──────────────────────────────────────────────────────────────
 # Concrete Products - UI
 # ──────────────────────────────────────────────────────────────
-class LinuxTkinterUI(Singleton):
+class LinuxTkinterUI:
     def __init__(self, home_img_path: Path):
         self.__home_img : Path          = home_img_path
         self.__root = tkinter.Tk()
@@ -143,20 +251,42 @@ class LinuxTkinterUI(Singleton):
         self.__root.config(cursor="none")
         
         # Preload home image
+        # Tk luôn lưu PhotoImage dạng 32-bit, nên giảm màu (mode "P") không tiết kiệm RAM
+        self.home_photo: Optional[tkinter.PhotoImage] = None
         try:
-            img = Image.open(self.__home_img)
-            resample = Image.NEAREST
-            img = img.resize((self.__screen_width, self.__screen_height), resample)
-            self.home_photo = ImageTk.PhotoImage(img)
+            self.home_photo = self.__load_home_photo()
         except Exception as e:
             Logger().error(f"Error loading home image: {str(e)}")
-            # Create blank image as fallback
-            self.home_photo = ImageTk.PhotoImage(Image.new('RGB', (self.__screen_width, self.__screen_height), 'black'))
+            # Fallback: canvas nền đen, không cần ảnh đen toàn màn hình
         
         # Create UI elements
+        # Ảnh home là một item trên canvas video, ẩn/hiện bằng itemconfigure
         self.__canvas = tkinter.Canvas(self.__root, bg="black", highlightthickness=0)
-        self.__home_lbl = tkinter.Label(self.__root, image=self.home_photo)
-        self.__home_lbl.place(x=0, y=0, relwidth=1, relheight=1)
+        self.__canvas.place(x=0, y=0, relwidth=1, relheight=1)
+        self.__home_item = self.__canvas.create_image(0, 0, anchor="nw", image=self.home_photo or "")
+
+    def __load_home_photo(self) -> tkinter.PhotoImage:
+        """Load the screen-sized home image, reusing the resized copy cached on disk"""
+        size = (self.__screen_width, self.__screen_height)
+        cache = self.__home_img.with_suffix(f".{size[0]}x{size[1]}.ppm")
+        try:
+            if cache.stat().st_mtime >= self.__home_img.stat().st_mtime:
+                # Tk đọc PPM bằng C, không cần nạp PIL
+                return tkinter.PhotoImage(master=self.__root, file=str(cache))
+        except (OSError, tkinter.TclError):
+            pass
+
+        from PIL import Image, ImageTk  # chỉ cần khi tạo lại cache
+        with Image.open(self.__home_img) as src:
+            img = src.convert("RGB").resize(size, Image.Resampling.LANCZOS)
+        tmp = cache.with_name(cache.name + ".tmp")
+        try:
+            img.save(tmp, format="PPM")
+            os.replace(tmp, cache)
+        except OSError as e:
+            Logger().warning(f"Cannot write home image cache: {e}")
+            return ImageTk.PhotoImage(img, master=self.__root)
+        return tkinter.PhotoImage(master=self.__root, file=str(cache))
 
     def root_ui(self) -> tkinter.Tk:
         return self.__root
@@ -164,8 +294,8 @@ class LinuxTkinterUI(Singleton):
     def canvas_ui(self) -> tkinter.Canvas:
         return self.__canvas
     
-    def home_lbl(self) -> tkinter.Label:
-        return self.__home_lbl
+    def home_item(self) -> int:
+        return self.__home_item
 
     def mainloop(self) -> None:
         return self.__root.mainloop()
@@ -176,11 +306,17 @@ class LinuxTkinterUI(Singleton):
     def cancel_run_loop_after_time(self, job: str) -> None:
         return self.__root.after_cancel(job)
 
+    def create_file_handler(self, fd: int, func: Callable) -> None:
+        self.__root.tk.createfilehandler(fd, tkinter.READABLE, lambda file, mask: func())
+
+    def delete_file_handler(self, fd: int) -> None:
+        self.__root.tk.deletefilehandler(fd)
+
 
 # ──────────────────────────────────────────────────────────────
 # Concrete Products - MEDIA (VLC)
 # ──────────────────────────────────────────────────────────────
-class LinuxVLCMediaEngine(LinuxTkinterUI, MediaEngine):
+class LinuxVLCMediaEngine(LinuxTkinterUI, MediaEngine, FileWatcher):
     def __init__(self, home_img_path: Path, uid_map: Dict[str, str], serial_port: SerialPort):
         # Options Pi4b +
         self.__opts = [
@@ -213,38 +349,86 @@ class LinuxVLCMediaEngine(LinuxTkinterUI, MediaEngine):
             "--no-mouse-events",
         ] 
 
+        # Nạp plugin VLC trên thread phụ, song song với việc dựng cửa sổ Tk
+        self.__vlc_error: Optional[Exception] = None
+        vlc_thread = threading.Thread(target=self.__build_vlc, daemon=True)
+        vlc_thread.start()
+
         super().__init__(home_img_path)
 
         self.__serial_port = serial_port
 
-        self.__vlc = vlc.Instance(self.__opts)
-        self.__player = self.__vlc.media_player_new()
+        vlc_thread.join()
+        if self.__vlc_error:
+            raise self.__vlc_error
 
         self.__root_ui: Optional[tkinter.Tk] = self.root_ui()
         self.__canvas: Optional[tkinter.Canvas] = self.canvas_ui()
-        self.__home_lbl: Optional[tkinter.Label] = self.home_lbl()
+        self.__home_item: int = self.home_item()
 
         # Setup linux close protocol
+        self.__shutdown_started = False
         self.__root_ui.bind("<Escape>", lambda e: self.__safe_shutdown())
         self.__root_ui.protocol("WM_DELETE_WINDOW", self.__safe_shutdown)
 
         self.__current_uid = ""
-        self.__media_cache = {}
         self.__uid_map = uid_map
 
+        # Giới hạn restart player: chỉ một lần restart chờ chạy, đếm theo UID trong RESTART_WINDOW_S
+        self.__restart_pending = False
+        self.__restart_uid = ""
+        self.__restart_count = 0
+        self.__restart_window_start = 0.0
+
+        # Tạo sẵn và parse tối đa MAX_MEDIA_CACHE media để lần chạm thẻ đầu tiên không bị trễ
+        # (parse bất đồng bộ, tối đa PARSE_TIMEOUT_MS mỗi file để file lỗi không chặn hàng đợi)
+        self.__media_cache: OrderedDict[str, vlc.Media] = OrderedDict()
+        for uid, path in islice(uid_map.items(), MAX_MEDIA_CACHE):
+            media = self.__new_media(path)
+            media.parse_with_options(vlc.MediaParseFlag.local, PARSE_TIMEOUT_MS)
+            self.__media_cache[uid] = media
+
         # Set canvas window ID
         self.__root_ui.update_idletasks()
         self.__player.set_xwindow(self.__canvas.winfo_id())
         
-        # Setup end of video event handling
+        # Setup player event handling
+        self.__attach_player_events()
+
+    def __build_vlc(self):
+        """Tạo vlc.Instance và MediaPlayer (chạy trên thread phụ)."""
+        try:
+            self.__vlc = vlc.Instance(self.__opts)
+            self.__player = self.__vlc.media_player_new()
+        except Exception as e:
+            self.__vlc_error = e
+
+    def __attach_player_events(self):
+        """Đăng ký sự kiện VLC cho MediaPlayer hiện tại."""
         self.__event_manager = self.__player.event_manager()
         self.__event_manager.event_attach(
             vlc.EventType.MediaPlayerEndReached,
             self.__on_video_end
         )
+        # Khởi tạo lại player theo sự kiện thay vì watchdog định kỳ
+        self.__event_manager.event_attach(
+            vlc.EventType.MediaPlayerEncounteredError,
+            self.__on_player_failure
+        )
+        self.__event_manager.event_attach(
+            vlc.EventType.MediaPlayerStopped,
+            self.__on_player_failure
+        )
 
-        #Kiểm tra 10s một lần xem chương trình có dừng hay không
-        self.__watch_player()
+    def __detach_player_events(self):
+        """Gỡ sự kiện VLC khỏi MediaPlayer hiện tại trước khi dừng/giải phóng nó."""
+        for event_type in (vlc.EventType.MediaPlayerEndReached,
+                           vlc.EventType.MediaPlayerEncounteredError,
+                           vlc.EventType.MediaPlayerStopped):
+            try:
+                self.__event_manager.event_detach(event_type)
+            except Exception:
+                pass
 
     def __on_video_end(self, event):
         """Handle end of video event"""
@@ -252,6 +436,13 @@ class LinuxVLCMediaEngine(LinuxTkinterUI, MediaEngine):
         if self.__current_uid:
             self.__root_ui.after(0, self.__restart_video)
 
+    def __on_player_failure(self, event):
+        """Handle player error/stopped event"""
+        # Schedule player restart in main thread (một lần, tránh dồn nhiều job restart)
+        if self.__current_uid and not self.__restart_pending:
+            self.__restart_pending = True
+            self.__root_ui.after(0, self.__restart_player)
+
     def __restart_video(self):
         """Restart the current video"""
         if self.__current_uid and self.__player:
@@ -271,13 +462,11 @@ class LinuxVLCMediaEngine(LinuxTkinterUI, MediaEngine):
                 self.__player.stop()
                 # Release media player resources
                 self.__player.set_media(None)
-                gc.collect()
             except Exception as e:
                 Logger().error(f"Error stopping player: {str(e)}")
             self.__current_uid = ""
             
-        self.__canvas.place_forget()
-        self.__home_lbl.place(x=0, y=0, relwidth=1, relheight=1)
+        self.__canvas.itemconfigure(self.__home_item, state="normal")
 
     def play_video(self, uid: str) -> None:
         """Play video for specified UID"""
@@ -291,9 +480,8 @@ class LinuxVLCMediaEngine(LinuxTkinterUI, MediaEngine):
                 self.__player.play()
                 self.__current_uid = uid
                 
-                # Show video canvas
-                self.__home_lbl.place_forget()
-                self.__canvas.place(x=0, y=0, relwidth=1, relheight=1)
+                # Hide home image, VLC draws into the canvas window
+                self.__canvas.itemconfigure(self.__home_item, state="hidden")
                 
                 Logger().info(f"Playing video for UID: {uid}")
             
@@ -301,49 +489,91 @@ class LinuxVLCMediaEngine(LinuxTkinterUI, MediaEngine):
             Logger().error(f"Video play error: {str(e)}")
             self.show_home()
 
+    def __new_media(self, path: str) -> vlc.Media:
+        """Create new media with optimizations"""
+        media = self.__vlc.media_new(path)
+        # Add media options for performance
+        media.add_option(":avcodec-hw=v4l2m2m")
+        media.add_option(":avcodec-skiploopfilter=4")
+        return media
+
     def __get_media(self, uid: str) -> vlc.Media:
-        """Get media from cache or create new with optimizations"""
+        """Get media from LRU cache or create new"""
         media = self.__media_cache.get(uid)
-        if not media:
-            media = self.__vlc.media_new(self.__uid_map[uid])
-            # Add media options for performance
-            media.add_option(":avcodec-hw=v4l2m2m")
-            media.add_option(":avcodec-skiploopfilter=4")
-            self.__media_cache[uid] = media
+        if media is not None:
+            self.__media_cache.move_to_end(uid)
+            return media
+
+        if len(self.__media_cache) >= MAX_MEDIA_CACHE:
+            # Bỏ media ít dùng nhất, trừ media đang phát
+            for old_uid in self.__media_cache:
+                if old_uid != self.__current_uid:
+                    self.__media_cache.pop(old_uid).release()
+                    break
+        media = self.__new_media(self.__uid_map[uid])
+        self.__media_cache[uid] = media
         return media
     
     def __attach_player_window(self):
         """Liên kết MediaPlayer mới với cửa sổ Tk."""
-        self.__root_ui.update_idletasks()
+        # Canvas đã được tạo cửa sổ từ lúc khởi động, không cần update_idletasks lại
         self.__player.set_xwindow(self.__canvas.winfo_id())
 
-    def __watch_player(self):
-        """Kiểm tra định kỳ trạng thái VLC; khởi tạo lại nếu lỗi."""
+    def __restart_player(self):
+        """Khởi tạo lại MediaPlayer nếu VLC lỗi hoặc dừng khi đang phát."""
+        self.__restart_pending = False
+        if not self.__current_uid:
+            return  # đã về màn hình home, player dừng là bình thường
         state = self.__player.get_state()
-        if state in (vlc.State.Error, vlc.State.Stopped):
-            Logger().warning(f"Watchdog: player state={state}, restarting")
-            try:
-                self.__player.stop()
-                self.__player.release()
-            except Exception:
-                pass
-            # tạo MediaPlayer mới rồi gắn vào cửa sổ
-            self.__player = self.__vlc.media_player_new()
-            self.__attach_player_window()
-            self.__restart_video()        # phát lại video hiện tại / về màn hình home
-        # gọi lại sau 10 s
-        self.__root_ui.after(10_000, self.__watch_player)
+        if state not in (vlc.State.Error, vlc.State.Stopped):
+            return
+
+        # Đếm số lần restart của UID hiện tại; video hỏng sẽ lỗi lại ngay nên phải có giới hạn
+        now = time.monotonic()
+        if (self.__restart_uid != self.__current_uid
+                or now - self.__restart_window_start > RESTART_WINDOW_S):
+            self.__restart_uid = self.__current_uid
+            self.__restart_count = 0
+            self.__restart_window_start = now
+        self.__restart_count += 1
+        if self.__restart_count > MAX_PLAYER_RESTARTS:
+            Logger().error(f"Player failed {MAX_PLAYER_RESTARTS} times for UID: {self.__current_uid}, back to home")
+            self.__restart_uid = ""  # chạm lại thẻ sẽ được thử lại từ đầu
+            self.show_home()
+            return
+
+        Logger().warning(f"Player state={state}, restarting ({self.__restart_count}/{MAX_PLAYER_RESTARTS})")
+        # Gỡ callback trước để stop() của player cũ không bắn Stopped lên lịch restart mới
+        self.__detach_player_events()
+        try:
+            self.__player.stop()
+            self.__player.release()
+        except Exception:
+            pass
+        # tạo MediaPlayer mới rồi gắn vào cửa sổ
+        self.__player = self.__vlc.media_player_new()
+        self.__attach_player_window()
+        self.__attach_player_events()
+        self.__restart_video()        # phát lại video hiện tại
 
     
     def __safe_shutdown(self, event = None) -> None:
         """Safe shutdown procedure"""
+        # <Escape> và WM_DELETE_WINDOW có thể cùng gọi: chỉ tắt một lần
+        if self.__shutdown_started:
+            return
+        self.__shutdown_started = True
         Logger().info("Initiating safe shutdown")
         
+        release_thread = None
         try:
             # Release VLC resources
             if self.__player:
-                self.__player.stop()
-                self.__player.release()
+                # Gỡ callback để VLC không lên lịch restart trong lúc tắt
+                self.__detach_player_events()
+                # Dừng/giải phóng libvlc song song với việc đóng serial và hủy cửa sổ
+                release_thread = threading.Thread(target=self.__release_player, daemon=True)
+                release_thread.start()
         except Exception as e:
             Logger().error(f"Error releasing VLC: {str(e)}")
         
@@ -360,6 +590,16 @@ class LinuxVLCMediaEngine(LinuxTkinterUI, MediaEngine):
         except tkinter.TclError:
             pass  # Window already destroyed
         
+        if release_thread:
+            release_thread.join(timeout=2)
         sys.exit(0)
 
+    def __release_player(self) -> None:
+        """Stop and release the VLC player (runs on a worker thread)"""
+        try:
+            self.__player.stop()
+            self.__player.release()
+        except Exception as e:
+            Logger().error(f"Error releasing VLC: {str(e)}")
+
 
@@ -1,24 +1,22 @@
-from .abstract_product import Config, SerialPort, MediaEngine
+from .abstract_product import SerialPort, MediaEngine
 from typing import List, Optional, Tuple, Dict, Callable
 from pathlib import Path
-from PIL import Image, ImageTk
 from utils.logger import Logger
 import serial
 import tkinter
 import vlc
-import yaml
+import threading
+import time
 import sys
+import os
+
+MAX_PLAYER_RESTARTS = 3   # số lần khởi tạo lại player tối đa cho một UID ...
+RESTART_WINDOW_S    = 30  # ... trong khoảng thời gian này, quá thì về màn hình home
 
-class Singleton:
-    _instance = None
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
 
 # --- Concrete Products for Win ---
 
-class WindownsConfig(Config):
+class WindownsConfig:
     def __init__(self):
         self.__video_dir = Path(r"D:\Outsource\RFID\Video")
         self.__home_img = Path(r"D:\Outsource\RFID\JPG\Home.jpg")
@@ -34,12 +32,21 @@ class WindownsConfig(Config):
 
     def load_config(self) -> Dict[str, str]:
         try:
+            import yaml  # nạp khi cần, không làm chậm lúc import module
+            loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
             with self.__cfg.open(encoding="utf-8") as f:
-                cfg = yaml.safe_load(f)
+                cfg = yaml.load(f, Loader=loader)
+            # Một lần đọc thư mục thay cho một lần stat mỗi UID
+            existing = self.__list_files(self.__video_dir)
             uid_map = {}
             for uid, fname in cfg.get("uid_map", {}).items():
-                path = (self.__video_dir / fname).resolve()
-                if not path.exists():
+                path = self.__video_dir / fname
+                if os.path.basename(fname) != fname:
+                    # Đường dẫn con hoặc tuyệt đối: không có trong lần scandir, kiểm tra riêng
+                    found = os.path.isfile(path)
+                else:
+                    found = fname in existing
+                if not found:
                     Logger().error(f"Video file not found: {path}")
                     continue
                 uid_map[uid] = str(path)
@@ -50,17 +57,27 @@ class WindownsConfig(Config):
             Logger().error(f"Configuration error: {e}")
             raise
 
+    @staticmethod
+    def __list_files(folder: Path) -> set:
+        """Names of the regular files in folder (empty if it cannot be read)"""
+        try:
+            return {e.name for e in os.scandir(folder) if e.is_file()}
+        except OSError as e:
+            Logger().error(f"Cannot read video directory {folder}: {e}")
+            return set()
+
     
         
 
 # ──────────────────────────────────────────────────────────────
 # Concrete Products - Serial
 # ──────────────────────────────────────────────────────────────
-class WindownsSerialPort(Singleton ,SerialPort):
+class WindownsSerialPort(SerialPort):
     def __init__(self, port_name: str = "COM20", baudrate: int = 115200):
         self.__port = port_name
         self.__baud = baudrate
         self.__ser: Optional[serial.Serial] = None
+        self.__rx_buf = bytearray()  # Dữ liệu chưa xử lý từ các lần đọc trước
 
         self.__max_backoff = 16  # Giới hạn thời gian backoff tối đa là 30 giây
         self.__min_backoff = 1  # Thời gian chờ tối thiểu là 2 giây
@@ -73,6 +90,7 @@ class WindownsSerialPort(Singleton ,SerialPort):
     def open(self) -> None:
         if self.__ser:
             self.__ser = None
+        self.__rx_buf = bytearray()
         try:
             self.__ser = serial.Serial(
                 self.__port,
@@ -84,7 +102,7 @@ class WindownsSerialPort(Singleton ,SerialPort):
             Logger().info(f"Serial connected: {self.__port}")
         except (serial.SerialException, OSError) as e:
             self.__ser = None
-            Logger().error(f"Serial connection failed: {str(e)}, reconnect after {self.__backoff_time}s")
+            Logger().error(f"Serial connection failed: {str(e)}")
             
 
     def close(self) -> None:
@@ -92,20 +110,35 @@ class WindownsSerialPort(Singleton ,SerialPort):
             self.__ser.close()
             self.__ser = None
     
-    def receive_datas(self) -> list[str]:
-        lines = []
+    def receive_last_data(self) -> Optional[str]:
         try:
-            while self.__ser.in_waiting > 0:
-                s = self.__ser.readline().decode("utf-8", "ignore").strip()
-                if s:
-                    lines.append(s)
+            n = self.__ser.in_waiting
+            if not n:
+                return None
+            # Đọc hết buffer một lần
+            self.__rx_buf += self.__ser.read(n)
         except (serial.SerialException, OSError) as e:
             self.close()
             Logger().error(f"Serial error: {e}")
-        return lines
+            return None
+        return self.__pop_last_line()
+
+    def __pop_last_line(self) -> Optional[str]:
+        """Tách các dòng trong buffer, chỉ decode dòng hoàn chỉnh cuối cùng"""
+        *lines, rest = self.__rx_buf.split(b"\n")
+        self.__rx_buf = rest  # dòng chưa trọn, giữ cho lần đọc sau
+        for line in reversed(lines):
+            line = line.strip()
+            if line:
+                return line.decode("ascii", "ignore")
+        return None
     
     def is_opened(self) -> bool:
         return bool(self.__ser and self.__ser.is_open)
+
+    def fileno(self) -> Optional[int]:
+        # Cổng COM trên Windows không hỗ trợ select, dùng polling
+        return None
             
     def get_time_polling(self):
         self.__error_count += 1
@@ -118,7 +151,7 @@ class WindownsSerialPort(Singleton ,SerialPort):
 # ──────────────────────────────────────────────────────────────
 # Concrete Products - UI
 # ──────────────────────────────────────────────────────────────
-class WindownsTkinterUI(Singleton):
+class WindownsTkinterUI:
     def __init__(self, home_img_path: Path):
         self.__home_img : Path          = home_img_path
         self.__root = tkinter.Tk()
@@ -136,6 +169,7 @@ class WindownsTkinterUI(Singleton):
         self.__root.config(cursor="none")
         
         # Preload home image
+        from PIL import Image, ImageTk  # nạp PIL sau khi cửa sổ Tk đã được tạo
         try:
             img = Image.open(self.__home_img)
             resample = Image.LANCZOS
@@ -204,6 +238,7 @@ class WindownsVLCMediaEngine(WindownsTkinterUI, MediaEngine):
         self.__home_lbl: Optional[tkinter.Label] = self.home_lbl()
 
         # Setup window close protocol
+        self.__shutdown_started = False
         self.__root_ui.bind("<Escape>", lambda e: self.__safe_shutdown())
         self.__root_ui.protocol("WM_DELETE_WINDOW", self.__safe_shutdown)
 
@@ -215,14 +250,53 @@ class WindownsVLCMediaEngine(WindownsTkinterUI, MediaEngine):
         self.__root_ui.update_idletasks()
         self.__player.set_hwnd(self.__canvas.winfo_id())
         
-        # Setup end of video event handling
+        # Setup player event handling
+        self.__attach_player_events()
+
+        # Giới hạn restart player: đếm theo UID trong RESTART_WINDOW_S
+        self.__restart_uid = ""
+        self.__restart_count = 0
+        self.__restart_window_start = 0.0
+
+        # Watchdog với chu kỳ thay đổi theo trạng thái player
+        self.__watch_job = ""
+        self.__check_pending = False
+        self.__watch_player()
+
+    def __attach_player_events(self):
+        """Đăng ký sự kiện VLC cho MediaPlayer hiện tại."""
         self.__event_manager = self.__player.event_manager()
         self.__event_manager.event_attach(
             vlc.EventType.MediaPlayerEndReached,
             self.__on_video_end
         )
+        # Lỗi thì kiểm tra ngay, không chờ chu kỳ watchdog
+        self.__event_manager.event_attach(
+            vlc.EventType.MediaPlayerEncounteredError,
+            self.__on_player_error
+        )
+
+    def __detach_player_events(self):
+        """Gỡ sự kiện VLC khỏi MediaPlayer hiện tại trước khi dừng/giải phóng nó."""
+        for event_type in (vlc.EventType.MediaPlayerEndReached,
+                           vlc.EventType.MediaPlayerEncounteredError):
+            try:
+                self.__event_manager.event_detach(event_type)
+            except Exception:
+                pass
 
-        #Kiểm tra 10s một lần xem chương trình có dừng hay không
+    def __on_player_error(self, event):
+        """Handle player error event"""
+        # Schedule a watchdog check in main thread (một lần, tránh dồn nhiều job)
+        if not self.__check_pending:
+            self.__check_pending = True
+            self.__root_ui.after(0, self.__check_player_now)
+
+    def __check_player_now(self):
+        """Chạy watchdog ngay thay cho lần kiểm tra đang chờ."""
+        self.__check_pending = False
+        if self.__watch_job:
+            self.__root_ui.after_cancel(self.__watch_job)
         self.__watch_player()
 
     def __on_video_end(self, event):
@@ -287,43 +361,84 @@ class WindownsVLCMediaEngine(WindownsTkinterUI, MediaEngine):
             media = self.__vlc.media_new(self.__uid_map[uid])
             # Add media options for performance
             media.add_option(":avcodec-hw=any")
-            media.add_option(":no-avcodec-dr")
             media.add_option(":avcodec-skiploopfilter=all")
             self.__media_cache[uid] = media
         return media
     
     def __attach_player_window(self):
         """Liên kết MediaPlayer mới với cửa sổ Tk."""
-        self.__root_ui.update_idletasks()
+        # Canvas đã được tạo cửa sổ từ lúc khởi động, không cần update_idletasks lại
         self.__player.set_hwnd(self.__canvas.winfo_id())
 
+    def __restart_allowed(self) -> bool:
+        """Đếm số lần restart của UID hiện tại; False khi đã vượt MAX_PLAYER_RESTARTS."""
+        now = time.monotonic()
+        if (self.__restart_uid != self.__current_uid
+                or now - self.__restart_window_start > RESTART_WINDOW_S):
+            self.__restart_uid = self.__current_uid
+            self.__restart_count = 0
+            self.__restart_window_start = now
+        self.__restart_count += 1
+        return self.__restart_count <= MAX_PLAYER_RESTARTS
+
     def __watch_player(self):
         """Kiểm tra định kỳ trạng thái VLC; khởi tạo lại nếu lỗi."""
-        state = self.__player.get_state()
-        if state in (vlc.State.Error, vlc.State.Stopped):
-            Logger().warning(f"Watchdog: player state={state}, restarting")
-            try:
-                self.__player.stop()
-                self.__player.release()
-            except Exception:
-                pass
-            # tạo MediaPlayer mới rồi gắn vào cửa sổ
-            self.__player = self.__vlc.media_player_new()
-            self.__attach_player_window()
-            self.__restart_video()        # phát lại video hiện tại / về màn hình home
-        # gọi lại sau 10 s
-        self.__root_ui.after(10_000, self.__watch_player)
+        self.__watch_job = ""  # job vừa chạy (hoặc đã bị hủy bởi __check_player_now)
+
+        state = None
+        if self.__current_uid:
+            state = self.__player.get_state()
+            if state in (vlc.State.Error, vlc.State.Stopped):
+                if self.__restart_allowed():
+                    Logger().warning(f"Watchdog: player state={state}, restarting ({self.__restart_count}/{MAX_PLAYER_RESTARTS})")
+                    # Gỡ callback trước để player cũ không bắn thêm sự kiện lỗi
+                    self.__detach_player_events()
+                    try:
+                        self.__player.stop()
+                        self.__player.release()
+                    except Exception:
+                        pass
+                    # tạo MediaPlayer mới rồi gắn vào cửa sổ
+                    self.__player = self.__vlc.media_player_new()
+                    self.__attach_player_window()
+                    self.__attach_player_events()
+                    self.__restart_video()    # phát lại video hiện tại
+                else:
+                    Logger().error(f"Player failed {MAX_PLAYER_RESTARTS} times for UID: {self.__current_uid}, back to home")
+                    self.__restart_uid = ""  # chạm lại thẻ sẽ được thử lại từ đầu
+                    self.show_home()
+
+        if not self.__current_uid:
+            # Màn hình home: player dừng là bình thường, không cần hỏi VLC
+            delay = 60_000
+        else:
+            # Đang phát ổn định thì kiểm tra thưa, vừa lỗi thì kiểm tra lại sớm
+            if state == vlc.State.Playing:
+                delay = 30_000
+            elif state == vlc.State.Error:
+                delay = 2_000
+            else:
+                delay = 10_000
+        self.__watch_job = self.__root_ui.after(delay, self.__watch_player)
 
     
     def __safe_shutdown(self, event = None) -> None:
         """Safe shutdown procedure"""
+        # <Escape> và WM_DELETE_WINDOW có thể cùng gọi: chỉ tắt một lần
+        if self.__shutdown_started:
+            return
+        self.__shutdown_started = True
         Logger().info("Initiating safe shutdown")
         
+        release_thread = None
         try:
             # Release VLC resources
-            if hasattr(self, 'player') and self.__player:
-                self.__player.stop()
-                self.__player.release()
+            if self.__player:
+                # Gỡ callback để VLC không lên lịch kiểm tra lại trong lúc tắt
+                self.__detach_player_events()
+                # Dừng/giải phóng libvlc song song với việc đóng serial và hủy cửa sổ
+                release_thread = threading.Thread(target=self.__release_player, daemon=True)
+                release_thread.start()
         except Exception as e:
             Logger().error(f"Error releasing VLC: {str(e)}")
         
@@ -340,6 +455,16 @@ class WindownsVLCMediaEngine(WindownsTkinterUI, MediaEngine):
         except tkinter.TclError:
             pass  # Window already destroyed
         
+        if release_thread:
+            release_thread.join(timeout=2)
         sys.exit(0)
 
+    def __release_player(self) -> None:
+        """Stop and release the VLC player (runs on a worker thread)"""
+        try:
+            self.__player.stop()
+            self.__player.release()
+        except Exception as e:
+            Logger().error(f"Error releasing VLC: {str(e)}")
+
 
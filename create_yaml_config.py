@@ -1,15 +1,27 @@
 # build_config.py
 from pathlib import Path
-import re
 import yaml
 
+try:
+    from yaml import CSafeDumper as _Dumper
+except ImportError:
+    from yaml import SafeDumper as _Dumper
+
 # === Cấu hình ===
 VIDEO_DIR = Path(r"D:\Outsource\Bo_doc_the_thong_minh\videokfix_19_6")
 HOME_PATH = "D:/Outsource/RFID/JPG/Home.jpg"   # giống ví dụ bạn đưa
 OUTPUT_YAML = VIDEO_DIR / "config.yaml"        # lưu ngay trong thư mục video
 VIDEO_EXTS = {".mp4", ".mov", ".mkv", ".avi", ".mpg", ".mpeg", ".webm"}
 
-HEX8 = re.compile(r"^[0-9A-Fa-f]{8}$")
+def _is_hex8(s: str) -> bool:
+    """True nếu s gồm đúng 8 ký tự hex (UID 4 byte)"""
+    if len(s) != 8 or not s.isalnum():
+        return False
+    try:
+        bytes.fromhex(s)
+        return True
+    except ValueError:
+        return False
 
 def main():
     if not VIDEO_DIR.exists():
@@ -31,7 +43,7 @@ def main():
         stem = Path(fname).stem
         # Nếu tên file bắt đầu bằng 8 ký tự hex → coi là UID
         first_token = stem.split("_", 1)[0]
-        if HEX8.match(first_token):
+        if _is_hex8(first_token):
             key = first_token.upper()
         else:
             key = f"PUT_UID_HERE_{idx:0{pad}d}"  # placeholder để bạn điền UID thật
@@ -45,7 +57,7 @@ def main():
 
     # Ghi YAML (giữ thứ tự, unicode)
     with OUTPUT_YAML.open("w", encoding="utf-8") as f:
-        yaml.safe_dump(data, f, sort_keys=False, allow_unicode=True)
+        yaml.dump(data, f, Dumper=_Dumper, sort_keys=False, allow_unicode=True)
 
     print(f"Đã tạo '{OUTPUT_YAML}' với {len(files)} mục.")
 
@@ -1,89 +1,136 @@
 from __future__ import annotations
-from typing import Dict
+from typing import Callable, Dict
+from functools import partial
 from abstract.factory.concrete_factory_win import WindownsAppComponents
 from abstract.factory.concrete_factory_linux import LinuxAppComponents
 from abstract.factory.abstract_factory import AppComponents
+from abstract.product.abstract_product import FileWatcher
 import platform
+import gc
 import sys
 from utils.logger import Logger
 
+# Trên Linux serial được đọc theo sự kiện: fd đăng ký với notifier của Tk (select/epoll),
+# mainloop ngủ cho tới khi có dữ liệu nên không cần asyncio. POLL_MS chỉ dùng khi cổng
+# không có fd (COM trên Windows) hoặc khi chưa mở được cổng.
 POLL_MS = 200
+FAST_POLL_MS = 50  # chu kỳ poll ngay sau khi có dữ liệu
 
 class RFIDVideoApp:
     def __init__(self, app_components: AppComponents) -> None:
         # 1) Hạ tầng theo nền tảng
         self.__config            = app_components.create_config()
-        self.__home_img_path     = self.__config.home_img()           # Path
-        self.__serial_port_name  = self.__config.serial_port_name()   # str
-        self.__baudrate          = self.__config.baudrate()           # int
-        self.__uid_map: Dict[str, str] = self.__config.load_config()  # {uid: filepath}
+        self.__home_img_path     = self.__config.home_img_path        # Path
+        self.__serial_port_name  = self.__config.serial_port_name     # str
+        self.__baudrate          = self.__config.baudrate             # int
+        self.__uid_map: Dict[str, str] = self.__config.uid_map        # {uid: filepath}
 
         # 2) Serial + Media (theo Abstract Factory)
         self.__serial = app_components.create_serial(self.__serial_port_name, self.__baudrate)
         self.__media  = app_components.create_media(self.__home_img_path, self.__uid_map, self.__serial)
 
-        # 3) Trạng thái chống lặp
+        # 3) Trạng thái chống lặp + bảng dispatch lệnh dựng sẵn từ config
         self.__last_cmd: str | None = None
+        # Khóa được intern để so sánh chống lặp bằng `is`; viết hoa cho khớp
+        # định dạng UID "%02X" mà ESP32 gửi lên
+        self.__dispatch: Dict[str, Callable[[], None]] = {
+            sys.intern(str(uid).upper()): partial(self.__media.play_video, uid) for uid in self.__uid_map
+        }
+        self.__dispatch["removed"] = self.__media.show_home
 
         # 4) Vòng lặp đọc serial + UI loop
+        self.__serial_fd: int | None = None
         self.__run_poll_serial  = ""
         self.__run_reconnect    = ""
-        self.__run_poll_serial = self.__media.run_loop_after_time(POLL_MS, self.__poll_serial)
+        self.__idle_streak      = 0
+        self.__start_serial_reader()
+
+        # 5) Các object khởi tạo ở trên (Tk, VLC, cache media) sống suốt chương trình:
+        #    đưa ra khỏi các thế hệ GC để lần thu gom sau không phải quét lại
+        gc.freeze()
         self.__media.mainloop()
 
     # ── Serial ────────────────────────────────────────────────
-    def __poll_serial(self) -> None:
-        if self.__serial.is_opened():
-            lines = self.__serial.receive_datas()
-            if lines:
-                self.__process_cmd(lines[-1])
-            
-            self.__run_poll_serial = self.__media.run_loop_after_time(POLL_MS, self.__poll_serial)
+    def __start_serial_reader(self) -> None:
+        fd = self.__serial.fileno()
+        if fd is not None and isinstance(self.__media, FileWatcher):
+            # Tk báo khi fd có dữ liệu, không cần timer polling
+            self.__serial_fd = fd
+            self.__media.create_file_handler(fd, self.__poll_serial)
         else:
-            # Hủy loop poll serial
+            self.__run_poll_serial = self.__media.run_loop_after_time(POLL_MS, self.__poll_serial)
+
+    def __stop_serial_reader(self) -> None:
+        if self.__serial_fd is not None:
+            self.__media.delete_file_handler(self.__serial_fd)
+            self.__serial_fd = None
+        if self.__run_poll_serial:
             self.__media.cancel_run_loop_after_time(self.__run_poll_serial)
             self.__run_poll_serial  = ""
 
+    def __poll_serial(self) -> None:
+        self.__run_poll_serial = ""  # job timer (nếu có) vừa chạy xong
+        cmd = None
+        if self.__serial.is_opened():
+            cmd = self.__serial.receive_last_data()
+            if cmd:
+                self.__process_cmd(sys.intern(cmd))
+
+        if self.__serial.is_opened():
+            if self.__serial_fd is None:
+                # Poll nhanh sau khi có dữ liệu, giãn dần về POLL_MS khi rảnh
+                self.__idle_streak = 0 if cmd else min(self.__idle_streak + 1, 2)
+                delay = min(FAST_POLL_MS << self.__idle_streak, POLL_MS)
+                self.__run_poll_serial = self.__media.run_loop_after_time(delay, self.__poll_serial)
+        else:
+            # Hủy đọc serial
+            self.__stop_serial_reader()
+
             # Run loop reconnect
-            self.__run_reconnect = self.__media.run_loop_after_time(self.__serial.get_time_polling() * 1000, self.__reconnect_serial)
+            self.__schedule_reconnect()
             
 
     def __reconnect_serial(self) -> None:
+        self.__run_reconnect = ""  # job reconnect vừa chạy xong, không cần hủy
         self.__serial.open()
         if self.__serial.is_opened():
-            # Hủy loop reconnect
-            self.__media.cancel_run_loop_after_time(self.__run_reconnect)
-            self.__run_reconnect    = ""
-
-            # Run loop poll serial
-            self.__run_poll_serial = self.__media.run_loop_after_time(POLL_MS, self.__poll_serial)
+            # Đọc serial trở lại
+            self.__start_serial_reader()
         else:
-            self.__run_reconnect = self.__media.run_loop_after_time(self.__serial.get_time_polling() * 1000, self.__reconnect_serial)
+            self.__schedule_reconnect()
+
+    def __schedule_reconnect(self) -> None:
+        # Log đúng thời gian chờ đã chọn (backoff có jitter nên chỉ biết sau get_time_polling)
+        delay_ms = int(self.__serial.get_time_polling() * 1000)
+        Logger().info("Serial reconnect in %.2fs", delay_ms / 1000)
+        self.__run_reconnect = self.__media.run_loop_after_time(delay_ms, self.__reconnect_serial)
 
 
     # ── Xử lý lệnh từ ESP32 ───────────────────────────────────
     def __process_cmd(self, cmd: str) -> None:
-        if cmd == self.__last_cmd:
-            return  # chống lặp y hệt, tránh spam phát lại
+        if cmd is self.__last_cmd:
+            return  # chống lặp y hệt, tránh spam phát lại (cmd đã được intern)
 
-        if cmd == "removed":
-            self.__media.show_home()
-        elif cmd in self.__uid_map:
-            self.__media.play_video(cmd)
+        action = self.__dispatch.get(cmd)
+        if action:
+            action()
         else:
             Logger().warning("Unknown UID/cmd: %s", cmd)
 
         self.__last_cmd = cmd
 
 
+_FACTORIES = {
+    "Linux": LinuxAppComponents,
+    "Windows": WindownsAppComponents,
+}
+
 def choose_factory() -> AppComponents:
-    if platform.system() == "Linux":
-        return LinuxAppComponents()
-    elif platform.system() == "Windows":
-        return WindownsAppComponents()
-    else:
+    factory = _FACTORIES.get(platform.system())
+    if factory is None:
         Logger().info("System don't support")
         sys.exit(1)
+    return factory()
 
 if __name__ == "__main__":
     try:
@@ -1,6 +1,9 @@
 from utils.pattern import Singleton
 import logging
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
+import atexit
+import queue
 import os
 
 class ScreenFormatter(logging.Formatter):
@@ -24,15 +27,20 @@ class ScreenFormatter(logging.Formatter):
         logging.CRITICAL: format.format(BOLD_RED)
     }
 
+    def __init__(self) -> None:
+        super().__init__()
+        # Tạo sẵn formatter cho từng level, không tạo lại mỗi record
+        self._formatters = {lvl: logging.Formatter(fmt) for lvl, fmt in self.FORMATS.items()}
+        self._default = logging.Formatter()
+
     def format(self, record: logging.LogRecord):
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
-        return formatter.format(record)
+        return self._formatters.get(record.levelno, self._default).format(record)
 
 class FileFormatter(logging.Formatter):
-    def format(self, record: logging.LogRecord):
-        FORMAT = "[%(asctime)s (%(pathname)s:%(lineno)d - %(funcName)s())] %(levelname)s -> %(message)s"
-        return logging.Formatter(FORMAT).format(record)
+    FORMAT = "[%(asctime)s (%(pathname)s:%(lineno)d - %(funcName)s())] %(levelname)s -> %(message)s"
+
+    def __init__(self) -> None:
+        super().__init__(self.FORMAT)
 
 class Logger(logging.Logger, metaclass=Singleton):
     """
@@ -70,7 +78,13 @@ class Logger(logging.Logger, metaclass=Singleton):
             h = logging.FileHandler(log_filename)
             h.setLevel(lvl_val)
             h.setFormatter(FileFormatter())
-            self.addHandler(h)
+
+            # Ghi file trên thread riêng, thread gọi log chỉ đưa record vào queue
+            q = queue.SimpleQueue()
+            self.addHandler(QueueHandler(q))
+            listener = QueueListener(q, h, respect_handler_level=True)
+            listener.start()
+            atexit.register(listener.stop)  # flush các record còn lại khi thoát
 
 
 
@@ -10,9 +10,12 @@ class Singleton(type):
     _instance = {}
     _lock = threading.Lock()
     def __call__(cls, *args, **kwds):
-        if cls not in cls._instance:
+        try:
+            return cls._instance[cls]
+        except KeyError:
+            # Chỉ lần khởi tạo đầu tiên mới cần khóa
             with cls._lock:
                 if cls not in cls._instance:
                     instance = super().__call__(*args, **kwds)
                     cls._instance[cls] = instance
-        return cls._instance[cls]
+            return cls._instance[cls]